@@ -1,11 +1,22 @@
 import argparse
 import polars as pl
-import pandas as pd
-import numpy as np
 import os
 from collections import defaultdict
 from typing import List, Tuple, Optional
 
+# column order and dtypes of the parquet files written by `revindex_to_parquet`
+PARQUET_SCHEMA = {
+    "hash": pl.UInt64,
+    "dataset_names": pl.List(pl.Utf8),
+    "taxonomy_list": pl.List(pl.Utf8),
+    "lca_lineage": pl.Utf8,
+    "lca_rank": pl.Utf8,
+    "ksize": pl.UInt32,
+    "scaled": pl.UInt32,
+    "source": pl.Utf8,
+}
+
+
 def compute_lca_strs(taxonomy_list: List[str]) -> Tuple[Optional[str], Optional[str]]:
     if not taxonomy_list:
         return None, None
@@ -15,14 +26,11 @@ def compute_lca_strs(taxonomy_list: List[str]) -> Tuple[Optional[str], Optional[
     if not split_lineages:
         return None, None
 
-    # Find the shortest lineage to avoid index errors
-    min_len = min(len(lineage) for lineage in split_lineages)
-
+    # zip stops at the shortest lineage; each col holds one rank across lineages
     lca = []
-    for i in range(min_len):
-        ith_values = [lineage[i] for lineage in split_lineages]
-        if all(val == ith_values[0] for val in ith_values):
-            lca.append(ith_values[0])
+    for col in zip(*split_lineages):
+        if col.count(col[0]) == len(col):
+            lca.append(col[0])
         else:
             break
 
@@ -35,67 +43,167 @@ def compute_lca_strs(taxonomy_list: List[str]) -> Tuple[Optional[str], Optional[
     return lca_lineage, lca_rank
 
 
-def merge_taxonomic_info_pandas(df: pl.DataFrame) -> pl.DataFrame:
-    duplicate_hashes = (
-        df.group_by(["hash", "ksize"])
-        .agg(pl.count("hash").alias("count"))
-        .filter(pl.col("count") > 1)
-        .select(["hash", "ksize"])
+def split_lineages(taxonomy: pl.Expr) -> pl.Expr:
+    """Tokenize each non-empty lineage in a taxonomy list into its ranks (once)."""
+    return taxonomy.list.eval(
+        pl.element().filter(pl.element() != "").str.split(";")
+    ).alias("tax_ranks")
+
+
+def lca_rank_stats(lf: pl.LazyFrame, max_depth: int) -> pl.LazyFrame:
+    """Per (hash, ksize), the number of distinct values (nu_i) and the first
+    value (r_i) found at each rank position of the group's lineages."""
+    ranks = [
+        pl.col("tax_ranks").list.get(i, null_on_oob=True).alias(f"rank_{i}")
+        for i in range(max_depth)
+    ]
+    # one row per lineage, so ranks are plain columns for the group-by
+    return (
+        lf.select(["hash", "ksize", "tax_ranks"])
+        .explode("tax_ranks")
+        .filter(pl.col("tax_ranks").is_not_null())
+        .select(["hash", "ksize", *ranks])
+        .group_by(["hash", "ksize"], maintain_order=False)
+        .agg([
+            agg
+            for i in range(max_depth)
+            for agg in (
+                pl.col(f"rank_{i}").n_unique().alias(f"nu_{i}"),
+                pl.col(f"rank_{i}").first().alias(f"r_{i}"),
+            )
+        ])
+    )
+
+
+def lca_columns(max_depth: int) -> List[pl.Expr]:
+    """Build lca_lineage and lca_rank from the columns produced by lca_rank_stats,
+    reusing _known_lca for groups whose rows already agreed on their LCA."""
+    # keep each rank only while it (and every rank above it) is shared by all lineages
+    shared = pl.lit(True)
+    lca_ranks = []
+    for i in range(max_depth):
+        shared = shared & (pl.col(f"nu_{i}") == 1) & pl.col(f"r_{i}").is_not_null()
+        lca_ranks.append(pl.when(shared).then(pl.col(f"r_{i}")))
+
+    if lca_ranks:
+        lca_lineage = pl.concat_str(lca_ranks, separator=";", ignore_nulls=True)
+        lca_lineage = pl.when(lca_lineage != "").then(lca_lineage)
+        last_rank = pl.coalesce(lca_ranks[::-1])
+    else:
+        lca_lineage = last_rank = pl.lit(None, pl.Utf8)
+
+    known = pl.col("_known_lca")
+    lca_lineage = pl.coalesce(known, lca_lineage)
+    last_rank = (
+        pl.when(known.is_not_null())
+        .then(known.str.split(";").list.last())
+        .otherwise(last_rank)
     )
+    return [
+        lca_lineage.alias("lca_lineage"),
+        pl.when(last_rank.str.contains("__", literal=True))
+        .then(last_rank.str.split("__").list.first())
+        .alias("lca_rank"),
+    ]
+
 
-    df_duplicates = df.join(duplicate_hashes, on=["hash", "ksize"], how="inner")
-    df_unique = df.join(duplicate_hashes, on=["hash", "ksize"], how="anti")
-    print(f"Found {len(df_duplicates)} row(s) with duplicated hashes and {len(df_unique)} unique row(s).")
-
-    pdf = df_duplicates.to_pandas()
-    grouped = pdf.groupby(["hash", "ksize"], sort=False)
-    merged_rows = []
-
-    for (hash_val, ksize_val), group in grouped:
-        all_names = sorted(set(n for lst in group["dataset_names"] for n in lst))
-        all_taxonomies = [
-            t
-            for entry in group["taxonomy_list"]
-            if entry is not None
-            for t in (
-                entry.tolist() if isinstance(entry, np.ndarray)
-                else entry if isinstance(entry, list)
-                else [entry]
+def merge_taxonomic_info_lazy(lf: pl.LazyFrame, assume_sorted: bool = False) -> pl.LazyFrame:
+    if assume_sorted:
+        # lets polars use its sorted-key paths for the window and group-by;
+        # results are wrong if the input is not actually sorted by hash
+        lf = lf.set_sorted("hash")
+
+    # deepest lineage in the input bounds the number of rank columns needed;
+    # this is the only eager step and reads just the taxonomy_list column
+    max_depth = lf.select(
+        pl.col("taxonomy_list").explode().str.count_matches(";").max()
+    ).collect().item()
+    max_depth = 0 if max_depth is None else max_depth + 1
+
+    # number of rows sharing each (hash, ksize), computed in a single window pass
+    lf = lf.with_columns(pl.len().over(["hash", "ksize"]).alias("_n"))
+    lf_unique = lf.filter(pl.col("_n") == 1).drop("_n")
+    lf_duplicates = (
+        lf.filter(pl.col("_n") > 1)
+        .drop("_n")
+        # if every row of a group carries the same non-empty lca_lineage, that is
+        # already the group's LCA and its lineages don't need to be compared
+        .with_columns(
+            pl.when(
+                (pl.col("lca_lineage").n_unique().over(["hash", "ksize"]) == 1)
+                & (pl.col("lca_lineage") != "")
             )
-        ]
-        scaled_vals = group["scaled"].unique()
-        scaled = scaled_vals[0] if len(scaled_vals) == 1 else None
-        lca_lineage, lca_rank = compute_lca_strs(all_taxonomies) if all_taxonomies else (None, None)
-        merged_rows.append({
-            "hash": hash_val,
-            "ksize": ksize_val,
-            "scaled": scaled,
-            "dataset_names": all_names,
-            "taxonomy_list": all_taxonomies or None,
-            "lca_lineage": lca_lineage,
-            "lca_rank": lca_rank,
-            "source": ";".join(sorted(set(group["source"].tolist())))
-        })
-    # print summary of merged rows
-    print(f"Merged {len(df_duplicates)} rows with duplicated hashes into {len(grouped)} unique rows.")
+            .then(pl.col("lca_lineage"))
+            .alias("_known_lca")
+        )
+        .with_columns([
+            # few distinct sources and many repeated dataset names:
+            # dedupe them per group on dictionary codes
+            pl.col("source").cast(pl.Categorical),
+            pl.col("dataset_names").cast(pl.List(pl.Categorical)),
+            split_lineages(
+                pl.when(pl.col("_known_lca").is_null()).then(pl.col("taxonomy_list"))
+            ),
+        ])
+    )
+
+    # merge each (hash, ksize) group and compute its LCA in a single vectorized group-by
+    merged_dups = (
+        lf_duplicates.group_by(["hash", "ksize"], maintain_order=False)
+        .agg([
+            pl.col("scaled").unique().alias("scaled_u"),
+            pl.col("dataset_names").explode().unique().cast(pl.Utf8).sort().alias("dataset_names"),
+            pl.col("taxonomy_list").explode().drop_nulls().alias("taxonomy_list"),
+            pl.col("source").unique().cast(pl.Utf8).sort().str.join(";").alias("source"),
+            pl.col("_known_lca").first(),
+        ])
+        .join(lca_rank_stats(lf_duplicates, max_depth), on=["hash", "ksize"], how="left")
+        .with_columns([
+            pl.when(pl.col("scaled_u").list.len() == 1)
+            .then(pl.col("scaled_u").list.first())
+            .otherwise(None)
+            .alias("scaled"),
+            pl.when(pl.col("taxonomy_list").list.len() > 0)
+            .then(pl.col("taxonomy_list"))
+            .otherwise(None)
+            .alias("taxonomy_list"),
+            *lca_columns(max_depth),
+        ])
+    )
+
+    # build both halves against the explicit output schema (no dtype inference)
+    to_schema = [pl.col(name).cast(dtype) for name, dtype in PARQUET_SCHEMA.items()]
+    return pl.concat(
+        [lf_unique.select(to_schema), merged_dups.select(to_schema)], how="vertical"
+    )
 
-    merged_dups = pl.from_dicts(merged_rows)
-    final_df = pl.concat([df_unique, merged_dups], how="vertical")
+
+def merge_taxonomic_info(df: pl.DataFrame) -> pl.DataFrame:
+    final_df = merge_taxonomic_info_lazy(df.lazy()).collect()
+    # print summary of merged rows
+    print(f"Merged {len(df)} row(s) into {len(final_df)} row(s) with unique hashes.")
     return final_df
 
-def main(args):
-    df = pl.read_parquet(args.parquet_file)
 
-    merged_df = merge_taxonomic_info_pandas(df)
+def main(args):
+    # stream the merged result straight to disk instead of holding the input,
+    # intermediate and merged frames in memory at the same time
+    lf = pl.scan_parquet(args.parquet_file).pipe(
+        merge_taxonomic_info_lazy, assume_sorted=args.assume_sorted
+    )
 
     if args.output:
-        merged_df.write_parquet(args.output)
+        lf.sink_parquet(args.output, compression="zstd", statistics=True)
         print(f"Wrote merged results to: {args.output}")
+    else:
+        merged_df = lf.collect(engine="streaming")
+        print(f"Merged result has {len(merged_df)} row(s) with unique hashes.")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Merge duplicate hash entries with different sources in a Parquet file.")
     parser.add_argument("parquet_file", help="Input Parquet file")
     parser.add_argument("-o", "--output", help="Optional output Parquet file to write merged result")
+    parser.add_argument("--assume-sorted", action="store_true", help="Input is already sorted by hash; enables polars' sorted group-by fast path")
     args = parser.parse_args()
     main(args)
 
@@ -120,7 +228,7 @@ def test_compute_lca_strs_no_common_lca():
     assert lineage is None, f"Expected no LCA lineage, got {lineage}"
     assert rank is None, f"Expected no LCA rank, got {rank}"
 
-def test_merge_taxonomic_info_pandas():
+def test_merge_taxonomic_info():
     df = pl.DataFrame({
         "hash": [1, 1, 2],
         "ksize": [31, 31, 31],
@@ -131,7 +239,7 @@ def test_merge_taxonomic_info_pandas():
         "lca_rank": ["p"] * 3,
         "source": ["db1", "db2", "db3"]
     })
-    merged = merge_taxonomic_info_pandas(df)
+    merged = merge_taxonomic_info(df)
 
     assert merged.height == 2
     row1 = merged.filter(pl.col("hash") == 1).to_dicts()[0]
@@ -158,11 +266,53 @@ def test_merge_taxonomic_info_partial_lca():
         "source": ["db1", "db2"]
     })
 
-    merged = merge_taxonomic_info_pandas(df)
+    merged = merge_taxonomic_info(df)
 
     assert merged.height == 1
     row = merged.to_dicts()[0]
     assert set(row["dataset_names"]) == {"X", "Y"}
     assert row["lca_lineage"] == "d__Bacteria;p__Proteobacteria;c__Gammaproteobacteria"
     assert row["lca_rank"] == "c"
-    assert row["source"] == "db1;db2"
\ No newline at end of file
+    assert row["source"] == "db1;db2"
+
+def test_merge_taxonomic_info_no_taxonomy():
+    df = pl.DataFrame({
+        "hash": [4, 4],
+        "ksize": [31, 31],
+        "scaled": [1000, 100000],
+        "dataset_names": [["X"], ["Y"]],
+        "taxonomy_list": [None, None],
+        "lca_lineage": [None, None],
+        "lca_rank": [None, None],
+        "source": ["db2", "db1"]
+    }, schema_overrides={"taxonomy_list": pl.List(pl.Utf8), "lca_lineage": pl.Utf8, "lca_rank": pl.Utf8})
+
+    merged = merge_taxonomic_info(df)
+
+    assert merged.height == 1
+    row = merged.to_dicts()[0]
+    assert row["scaled"] is None
+    assert row["taxonomy_list"] is None
+    assert row["lca_lineage"] is None
+    assert row["lca_rank"] is None
+    assert row["source"] == "db1;db2"
+
+
+def test_merge_taxonomic_info_dataset_names_sorted_unique():
+    df = pl.DataFrame({
+        "hash": [5, 5, 5],
+        "ksize": [31, 31, 31],
+        "scaled": [1000, 1000, 1000],
+        "dataset_names": [["C", "A"], ["B", "A"], ["C"]],
+        "taxonomy_list": [None, None, None],
+        "lca_lineage": [None, None, None],
+        "lca_rank": [None, None, None],
+        "source": ["db1", "db2", "db1"]
+    }, schema_overrides={"taxonomy_list": pl.List(pl.Utf8), "lca_lineage": pl.Utf8, "lca_rank": pl.Utf8})
+
+    merged = merge_taxonomic_info(df)
+
+    assert merged.height == 1
+    row = merged.to_dicts()[0]
+    assert row["dataset_names"] == ["A", "B", "C"]
+    assert row["source"] == "db1;db2"
@@ -1,9 +1,13 @@
 import os
+import numpy as np
 import polars as pl
 import matplotlib.pyplot as plt
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 
 
+PARQUET_COLUMNS = ["ksize", "lca_rank"]
+
 RANK_ORDER = [
     "species", "genus", "family", "order", "class", "phylum", "kingdom", "domain", "no_lca"
 ]
@@ -15,58 +19,60 @@ RANK_COLORS = {
 }
 RANK_COLORS["no_lca"] = "#dddddd"  # light gray
 
+def existing_files(files: list[str], kind: str) -> list[str]:
+    found = []
+    for f in files:
+        if os.path.isfile(f):
+            found.append(f)
+        else:
+            print(f"Warning: {kind} '{f}' does not exist, skipping.")
+    if not found:
+        raise ValueError(f"No valid {kind}s were read.")
+    return found
+
 def read_lca_summary_csvs(csv_files: list[str]) -> pl.DataFrame:
-    dfs = []
-    for f in csv_files:
-        try:
-            df = pl.read_csv(f)
-            # keep only required columns
-            dfs.append(df.select(["ksize", "lca_rank", "percent"]))
-        except Exception as e:
-            print(f"Warning: failed to read summary CSV '{f}': {e}")
-    if not dfs:
-        raise ValueError("No valid LCA summary CSVs were read.")
-    return pl.concat(dfs)
+    csv_files = existing_files(csv_files, "LCA summary CSV")
+    # read files concurrently (polars releases the GIL), inferring each file's
+    # schema separately and keeping only required columns
+    columns = ["ksize", "lca_rank", "percent"]
+    with ThreadPoolExecutor(max_workers=min(len(csv_files), os.cpu_count() or 1)) as ex:
+        dfs = list(ex.map(lambda f: pl.read_csv(f, columns=columns), csv_files))
+    return pl.concat(dfs, how="vertical_relaxed")
+
+def scan_parquet_files(parquet_files: list[str]) -> pl.LazyFrame:
+    # only the columns needed for the LCA rank counts are read from disk;
+    # set SOURMASH_EXPORT_EAGER=1 to fall back to an eager read
+    if os.environ.get("SOURMASH_EXPORT_EAGER") == "1":
+        return pl.read_parquet(parquet_files, columns=PARQUET_COLUMNS).lazy()
+    return pl.scan_parquet(parquet_files).select(PARQUET_COLUMNS)
 
 def read_parquet_files(parquet_files: list[str]) -> pl.DataFrame:
-    dfs = []
-    for f in parquet_files:
-        try:
-            df = pl.read_parquet(f)
-            dfs.append(df)
-        except Exception as e:
-            print(f"Warning: failed to read Parquet file '{f}': {e}")
-    if not dfs:
-        raise ValueError("No valid Parquet files were read.")
-    df = pl.concat(dfs)
-
-    # Drop "unclassified" rows, but keep "no_lca" rows
+    parquet_files = existing_files(parquet_files, "Parquet file")
+    df = scan_parquet_files(parquet_files)
+
+    # Drop "unclassified" rows, but keep "no_lca" (null) rows. The predicate is
+    # on the raw column, ahead of any relabelling, so it is pushed into the scan
     df = (
         df
-        .filter(~pl.col("lca_rank").eq("unclassified"))  # drop true "unclassified"
-        .with_columns([
-            pl.when(pl.col("lca_rank").is_null())
-            .then("no_lca")
-            .otherwise(pl.col("lca_rank"))
-            .alias("lca_rank")
-        ])
+        .filter(pl.col("lca_rank").ne_missing("unclassified"))
+        .with_columns(
+            pl.col("lca_rank")
+            .fill_null("no_lca")
+            # only a handful of ranks: group on u32 codes rather than strings
+            .cast(pl.Categorical)
+        )
     )
 
     # Count hashes per LCA rank per ksize
-    rank_counts = df.group_by(["ksize", "lca_rank"]).agg(pl.count("hash").alias("count"))
+    rank_counts = df.group_by(["ksize", "lca_rank"], maintain_order=False).agg(pl.len().alias("count"))
 
     # Normalize to percent within each ksize
-    df_norm = (
-        rank_counts.join(
-            rank_counts.group_by("ksize").agg(pl.sum("count").alias("total")),
-            on="ksize"
-        ).with_columns(
-            (pl.col("count") / pl.col("total") * 100).alias("percent")
-        )
+    df_norm = rank_counts.with_columns(
+        (pl.col("count") / pl.col("count").sum().over("ksize") * 100).alias("percent")
     )
-    return df_norm.select(["ksize", "lca_rank", "percent"])
+    return df_norm.select(["ksize", "lca_rank", "percent"]).collect(engine="streaming")
 
-def plot_lca_distribution(input_files: list[str], save_path: str = None):
+def plot_lca_distribution(input_files: list[str], save_path: str = None, title_basename: str = None):
     csv_files = [f for f in input_files if f.endswith(".csv")]
     parquet_files = [f for f in input_files if f.endswith(".parquet")]
 
@@ -80,41 +86,38 @@ def plot_lca_distribution(input_files: list[str], save_path: str = None):
     else:
         raise ValueError("No valid .csv or .parquet files provided.")
 
-    # Convert to Pandas for pivot and plot
-    df_pandas = (
-        df_norm
-        .with_columns(pl.col("ksize").cast(pl.Utf8))
-        .select(["ksize", "lca_rank", "percent"])
-        .to_pandas()
-    )
-
     # Step 2: Pivot for stacked bar
-    df_pivot = df_pandas.pivot_table(
-        index="ksize", columns="lca_rank", values="percent", aggfunc="sum", fill_value=0
+    # group-by output order is arbitrary; sort the small normalized frame once
+    wide = (
+        df_norm
+        .sort(["ksize", "lca_rank"])
+        .pivot(on="lca_rank", index="ksize", values="percent", aggregate_function="sum")
     )
-    df_pivot = df_pivot.reindex(columns=RANK_ORDER, fill_value=0)
+    ranks_present = [rank for rank in RANK_ORDER if rank in wide.columns]
+    wide = wide.select(["ksize"] + [pl.col(rank).fill_null(0.0) for rank in ranks_present])
+    ksizes = wide["ksize"].cast(pl.Utf8).to_list()
 
     # Step 3: Plot
     fig, ax = plt.subplots(figsize=(10, 6))
     legend_elements = []
 
-    bottom = [0] * len(df_pivot)
-    for rank in RANK_ORDER:
-        if rank in df_pivot.columns:
-            bar = ax.bar(
-                df_pivot.index,
-                df_pivot[rank],
-                label=rank,
-                bottom=bottom,
-                color=RANK_COLORS.get(rank, "#333333")  # fallback to dark gray if needed
-            )
-            bottom = [b + v for b, v in zip(bottom, df_pivot[rank])]
-            
-            # Save just one artist for the legend (not one per bar group)
-            legend_elements.append((rank, bar[0]))
-
-    if args.title_basename:
-        title = f"{args.title_basename} - % Hashes by LCA Rank (per k-mer size)"
+    # each rank's bars start where the previous ranks' cumulative percent ends
+    mat = np.stack([wide[rank].to_numpy() for rank in ranks_present])
+    bottoms = np.vstack([np.zeros(mat.shape[1]), np.cumsum(mat, axis=0)[:-1]])
+    for i, rank in enumerate(ranks_present):
+        bar = ax.bar(
+            ksizes,
+            mat[i],
+            label=rank,
+            bottom=bottoms[i],
+            color=RANK_COLORS.get(rank, "#333333")  # fallback to dark gray if needed
+        )
+
+        # Save just one artist for the legend (not one per bar group)
+        legend_elements.append((rank, bar[0]))
+
+    if title_basename:
+        title = f"{title_basename} - % Hashes by LCA Rank (per k-mer size)"
     else:
         title = "% Hashes by LCA Rank (per k-mer size)"
     ax.set_title(title)
@@ -139,5 +142,5 @@ if __name__ == "__main__":
     parser.add_argument("--save", help="Save the plot to a file (.png, .pdf, or .svg)", default=None)
     parser.add_argument("--title-basename", help="title basename for the plot", default=None)
     args = parser.parse_args()
-    plot_lca_distribution(args.input_files, args.save)
+    plot_lca_distribution(args.input_files, args.save, args.title_basename)
 
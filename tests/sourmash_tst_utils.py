@@ -3,13 +3,10 @@ import sys
 import os
 import tempfile
 import shutil
-import subprocess
 import collections
-import pprint
 
 import importlib.metadata
 import traceback
-from io import open  # pylint: disable=redefined-builtin
 from io import StringIO
 
 
@@ -3,13 +3,11 @@ Tests for export
 """
 
 import os
-import csv
+import collections
 import pytest
 import polars as pl
-import pandas as pd
 
-import sourmash_tst_utils as utils
-from sourmash_tst_utils import SourmashCommandFailed
+from sourmash_tst_utils import SourmashCommandFailed, RunnerContext
 
 
 def get_test_data(filename):
@@ -17,106 +15,155 @@ def get_test_data(filename):
     return os.path.join(thisdir, "test-data", filename)
 
 
-def test_installed(runtmp):
-    with pytest.raises(utils.SourmashCommandFailed):
-        runtmp.sourmash("scripts", "revindex_to_parquet")
+def _run_export(runtmp, *inputs, taxonomy=None, lca=None, output=None):
+    "Run revindex_to_parquet on the given databases via runtmp.sourmash."
+    args = ["scripts", "revindex_to_parquet", *inputs, "--output", output]
+    if taxonomy:
+        args += ["--taxonomy", taxonomy]
+    if lca:
+        args += ["--lca-info", lca]
+    return runtmp.sourmash(*args)
 
-    assert "usage:  revindex_to_parquet" in runtmp.last_result.err
 
+ExportResult = collections.namedtuple("ExportResult", ["parquet", "lca_info"])
 
-def test_rocksdb_revindex_to_parquet_simple(runtmp, capfd):
-    revindex = get_test_data("podar-ref-subset.branch0_9_13.internal.rocksdb")
-    out_parquet = runtmp.output("podar-ref-subset.branch0_9_13.internal.parquet")
+# lineage shared by both test6 genomes, and the taxonomy_list of a hash found in both
+_SHEWANELLA_LINEAGE = (
+    "d__Bacteria;p__Proteobacteria;c__Gammaproteobacteria;"
+    "o__Enterobacterales;f__Shewanellaceae;g__Shewanella;"
+    "s__Shewanella baltica"
+)
+_EXPECTED_TAX_LIST = [_SHEWANELLA_LINEAGE, _SHEWANELLA_LINEAGE]
 
-    runtmp.sourmash("scripts", "revindex_to_parquet", revindex, "--output", out_parquet)
 
-    captured = capfd.readouterr()
-    print(captured.out)
-    print(captured.err)
+@pytest.fixture(scope="session")
+def export_revindex(tmp_path_factory):
+    """
+    Run revindex_to_parquet once per unique set of arguments and cache the
+    output paths for the rest of the test session.
+    """
+    cache = {}
 
-    assert os.path.exists(out_parquet), f"Expected output file at {out_parquet}."
+    def _export(*databases, taxonomy=None, lca_info=False):
+        key = (databases, taxonomy, lca_info)
+        if key not in cache:
+            runtmp = RunnerContext(str(tmp_path_factory.mktemp("export")))
+            out_parquet = runtmp.output("export.parquet")
+            out_lca = runtmp.output("export.lca.csv") if lca_info else None
 
-    # Optionally verify content with Polars
-    df = pl.read_parquet(out_parquet)
-    # print the first few rows
-    print(df.head())
-    assert "hash" in df.columns
-    assert "dataset_names" in df.columns
-    assert len(df) == 84
-    # check first few lines
-    assert df[0, "hash"] == 2925290528259
-    print(";".join(df[0, "dataset_names"]))
-    names0 = df[0, "dataset_names"]
-    assert (
-        ";".join(names0)
-        == "NC_009661.1 Shewanella baltica OS185 plasmid pS18501, complete sequence;NC_011665.1 Shewanella baltica OS223 plasmid pS22303, complete sequence"
+            _run_export(
+                runtmp, *databases, taxonomy=taxonomy, lca=out_lca, output=out_parquet
+            )
+
+            assert os.path.exists(out_parquet), f"Expected output file at {out_parquet}."
+            cache[key] = ExportResult(out_parquet, out_lca)
+        return cache[key]
+
+    return _export
+
+
+def parquet_shape(path):
+    "Row count and column names, read from the parquet footer only."
+    lf = pl.scan_parquet(path)
+    return lf.select(pl.len()).collect().item(), lf.collect_schema().names()
+
+
+def assert_rows_present(df, expected_rows):
+    "Check that every expected row (matching on its keys) is found in df."
+    expected = pl.DataFrame(expected_rows)
+    missing = expected.join(df, on=expected.columns, how="anti")
+    assert missing.height == 0, f"Expected rows not found:\n{missing}"
+
+
+@pytest.fixture(scope="session")
+def superkingdom_tax_csv(tmp_path_factory):
+    "test6 taxonomy with the 'domain' column renamed to 'superkingdom'."
+    out = tmp_path_factory.mktemp("tax") / "test6.taxonomy-superkingdom.csv"
+    (
+        pl.read_csv(get_test_data("test6.taxonomy.csv"), infer_schema_length=0)
+        .rename({"domain": "superkingdom"})
+        .write_csv(out)
     )
+    return str(out)
 
 
-def test_rocksdb_revindex_to_parquet_test6_no_taxonomy(runtmp, capfd):
-    revindex = get_test_data("test6.rocksdb")
-    out_parquet = runtmp.output("test6.parquet")
+def test_installed(runtmp):
+    with pytest.raises(SourmashCommandFailed):
+        runtmp.sourmash("scripts", "revindex_to_parquet")
 
-    runtmp.sourmash("scripts", "revindex_to_parquet", revindex, "--output", out_parquet)
+    assert "usage:  revindex_to_parquet" in runtmp.last_result.err
 
-    captured = capfd.readouterr()
-    print(captured.out)
-    print(captured.err)
+
+@pytest.mark.parametrize(
+    "database, n_rows, first_hash, row, row_hash, row_names",
+    [
+        (
+            "podar-ref-subset.branch0_9_13.internal.rocksdb",
+            84,
+            2925290528259,
+            0,
+            2925290528259,
+            "NC_009661.1 Shewanella baltica OS185 plasmid pS18501, complete sequence;NC_011665.1 Shewanella baltica OS223 plasmid pS22303, complete sequence",
+        ),
+        (
+            "test6.rocksdb",
+            23910,
+            15249706293397504,
+            50,
+            8357480319128064,
+            "GCF_000021665.1 Shewanella baltica OS223;GCF_000017325.1 Shewanella baltica OS185",
+        ),
+    ],
+    ids=["podar-ref-subset", "test6"],
+)
+def test_rocksdb_revindex_to_parquet_no_taxonomy(
+    export_revindex, database, n_rows, first_hash, row, row_hash, row_names
+):
+    revindex = get_test_data(database)
+    out_parquet, _ = export_revindex(revindex)
 
     assert os.path.exists(out_parquet), f"Expected output file at {out_parquet}."
 
-    # verify content with Polars
-    df = pl.read_parquet(out_parquet)
+    # check row count and columns from the parquet metadata
+    n, columns = parquet_shape(out_parquet)
+    assert "hash" in columns
+    assert "dataset_names" in columns
+    assert n == n_rows
+    # check that all columns are present
+    assert len(columns) == 8
+
+    # verify content with Polars, reading only the columns checked below
+    df = pl.read_parquet(out_parquet, columns=["hash", "dataset_names"])
     # print the first few rows
     print(df.head())
-    assert "hash" in df.columns
-    assert "dataset_names" in df.columns
-    assert len(df) == 23910
-    # check that all columns are present
-    assert len(df.columns) == 8
     # check some lines
-    assert df[0, "hash"] == 15249706293397504
-    assert df[50, "hash"] == 8357480319128064
-    print(";".join(df[50, "dataset_names"]))
-    names0 = df[50, "dataset_names"]
-    print(names0)
-    assert (
-        ";".join(names0)
-        == "GCF_000021665.1 Shewanella baltica OS223;GCF_000017325.1 Shewanella baltica OS185"
-    )
+    assert df[0, "hash"] == first_hash
+    assert df[row, "hash"] == row_hash
+    names = df[row, "dataset_names"]
+    print(names)
+    assert ";".join(names) == row_names
 
 
-def test_rocksdb_revindex_to_parquet_test6_with_taxonomy(runtmp, capfd):
+def test_rocksdb_revindex_to_parquet_test6_with_taxonomy(export_revindex):
     revindex = get_test_data("test6.rocksdb")
     tax_csv = get_test_data("test6.taxonomy.csv")
-    out_parquet = runtmp.output("test6.parquet")
-    out_lca = runtmp.output("test6.lca.csv")
-
-    runtmp.sourmash(
-        "scripts",
-        "revindex_to_parquet",
-        revindex,
-        "--output",
-        out_parquet,
-        "--taxonomy",
-        tax_csv,
-        "--lca-info",
-        out_lca,
-    )
-
-    captured = capfd.readouterr()
-    print(captured.out)
-    print(captured.err)
+    out_parquet, out_lca = export_revindex(revindex, taxonomy=tax_csv, lca_info=True)
 
     assert os.path.exists(out_parquet), f"Expected output file at {out_parquet}."
 
-    # verify content with Polars
-    df = pl.read_parquet(out_parquet)
+    # check row count and columns from the parquet metadata
+    n_rows, columns = parquet_shape(out_parquet)
+    assert "hash" in columns
+    assert "dataset_names" in columns
+    assert n_rows == 23910
+
+    # verify content with Polars, reading only the columns checked below
+    df = pl.read_parquet(
+        out_parquet,
+        columns=["hash", "dataset_names", "taxonomy_list", "lca_lineage", "lca_rank"],
+    )
     # print the first few rows
     print(df.head())
-    assert "hash" in df.columns
-    assert "dataset_names" in df.columns
-    assert len(df) == 23910
     # check some lines
     assert df[0, "hash"] == 15249706293397504
     print(";".join(df[50, "dataset_names"]))
@@ -126,17 +173,11 @@ def test_rocksdb_revindex_to_parquet_test6_with_taxonomy(runtmp, capfd):
         == "GCF_000021665.1 Shewanella baltica OS223;GCF_000017325.1 Shewanella baltica OS185"
     )
     print(";".join(df[50, "taxonomy_list"]))
-    tax_list = df[50, "taxonomy_list"]
-    assert (
-        ";".join(tax_list)
-        == "d__Bacteria;p__Proteobacteria;c__Gammaproteobacteria;o__Enterobacterales;f__Shewanellaceae;g__Shewanella;s__Shewanella baltica;d__Bacteria;p__Proteobacteria;c__Gammaproteobacteria;o__Enterobacterales;f__Shewanellaceae;g__Shewanella;s__Shewanella baltica"
-    )
+    tax_list = df[50, "taxonomy_list"].to_list()
+    assert tax_list == _EXPECTED_TAX_LIST
     print(df[50, "lca_lineage"])
     lca_lineage = df[50, "lca_lineage"]
-    assert (
-        lca_lineage
-        == "d__Bacteria;p__Proteobacteria;c__Gammaproteobacteria;o__Enterobacterales;f__Shewanellaceae;g__Shewanella;s__Shewanella baltica"
-    )
+    assert lca_lineage == _SHEWANELLA_LINEAGE
     print(df[50, "lca_rank"])
     lca_rank = df[50, "lca_rank"]
     assert lca_rank == "species"
@@ -144,7 +185,7 @@ def test_rocksdb_revindex_to_parquet_test6_with_taxonomy(runtmp, capfd):
     # check that the lca file was created
     assert os.path.exists(out_lca), f"Expected output file at {out_lca}."
     # check that the lca file contains the expected columns
-    lca_df = pd.read_csv(out_lca)
+    lca_df = pl.read_csv(out_lca)
     print(lca_df)
     expected_rows = [
         {"source": "test6.rocksdb", "lca_rank": "family", "count": 8, "percent": 0.03},
@@ -157,59 +198,32 @@ def test_rocksdb_revindex_to_parquet_test6_with_taxonomy(runtmp, capfd):
         {"source": "test6.rocksdb", "lca_rank": "order", "count": 1, "percent": 0.00},
     ]
 
-    for expected_row in expected_rows:
-        assert any(
-            all(row[k] == expected_row[k] for k in expected_row)
-            for row in lca_df.to_dict(orient="records")
-        ), f"Expected row not found: {expected_row}"
+    assert_rows_present(lca_df, expected_rows)
 
 
-def test_rocksdb_revindex_to_parquet_test6_with_taxonomy_superkindom(runtmp, capfd):
+@pytest.mark.slow
+def test_rocksdb_revindex_to_parquet_test6_with_taxonomy_superkindom(
+    export_revindex, superkingdom_tax_csv
+):
     # check that superkingdom header can be used in place of domain
     revindex = get_test_data("test6.rocksdb")
-    tax_csv = get_test_data("test6.taxonomy.csv")
-    tax_mod = runtmp.output("test6.taxonomy-superkingdom.csv")
-    out_parquet = runtmp.output("test6.parquet")
-
-    # open tax_csv and replace "domain" in header with "superkingdom"
-    with open(tax_csv, "r") as f:
-        rows = list(csv.DictReader(f))
-        header = ["superkingdom" if col == "domain" else col for col in rows[0].keys()]
-        updated_rows = [
-            {("superkingdom" if k == "domain" else k): v for k, v in row.items()}
-            for row in rows
-        ]
-        with open(tax_mod, "w", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=header)
-            writer.writeheader()
-            writer.writerows(updated_rows)
-
-    runtmp.sourmash(
-        "scripts",
-        "revindex_to_parquet",
-        revindex,
-        "--output",
-        out_parquet,
-        "--taxonomy",
-        tax_mod,
-    )
-
-    print(runtmp.last_result.out)
-    print(runtmp.last_result.err)
-
-    captured = capfd.readouterr()
-    print(captured.out)
-    print(captured.err)
+    out_parquet, _ = export_revindex(revindex, taxonomy=superkingdom_tax_csv)
 
     assert os.path.exists(out_parquet), f"Expected output file at {out_parquet}."
 
-    # verify content with Polars
-    df = pl.read_parquet(out_parquet)
+    # check row count and columns from the parquet metadata
+    n_rows, columns = parquet_shape(out_parquet)
+    assert "hash" in columns
+    assert "dataset_names" in columns
+    assert n_rows == 23910
+
+    # verify content with Polars, reading only the columns checked below
+    df = pl.read_parquet(
+        out_parquet,
+        columns=["hash", "dataset_names", "taxonomy_list", "lca_lineage", "lca_rank"],
+    )
     # print the first few rows
     print(df.head())
-    assert "hash" in df.columns
-    assert "dataset_names" in df.columns
-    assert len(df) == 23910
     # check some lines
     assert df[0, "hash"] == 15249706293397504
     print(";".join(df[50, "dataset_names"]))
@@ -219,17 +233,11 @@ def test_rocksdb_revindex_to_parquet_test6_with_taxonomy_superkindom(runtmp, cap
         == "GCF_000021665.1 Shewanella baltica OS223;GCF_000017325.1 Shewanella baltica OS185"
     )
     print(";".join(df[50, "taxonomy_list"]))
-    tax_list = df[50, "taxonomy_list"]
-    assert (
-        ";".join(tax_list)
-        == "d__Bacteria;p__Proteobacteria;c__Gammaproteobacteria;o__Enterobacterales;f__Shewanellaceae;g__Shewanella;s__Shewanella baltica;d__Bacteria;p__Proteobacteria;c__Gammaproteobacteria;o__Enterobacterales;f__Shewanellaceae;g__Shewanella;s__Shewanella baltica"
-    )
+    tax_list = df[50, "taxonomy_list"].to_list()
+    assert tax_list == _EXPECTED_TAX_LIST
     print(df[50, "lca_lineage"])
     lca_lineage = df[50, "lca_lineage"]
-    assert (
-        lca_lineage
-        == "d__Bacteria;p__Proteobacteria;c__Gammaproteobacteria;o__Enterobacterales;f__Shewanellaceae;g__Shewanella;s__Shewanella baltica"
-    )
+    assert lca_lineage == _SHEWANELLA_LINEAGE
     print(df[50, "lca_rank"])
     lca_rank = df[50, "lca_rank"]
     assert lca_rank == "species"
@@ -241,15 +249,7 @@ def test_rocksdb_revindex_to_parquet_test6_bad_tax_file(runtmp, capfd):
     out_parquet = runtmp.output("test6.parquet")
 
     with pytest.raises(SourmashCommandFailed):
-        runtmp.sourmash(
-            "scripts",
-            "revindex_to_parquet",
-            revindex,
-            "--output",
-            out_parquet,
-            "--taxonomy",
-            tax_csv,
-        )
+        _run_export(runtmp, revindex, taxonomy=tax_csv, output=out_parquet)
 
     captured = capfd.readouterr()
     print(captured.out)
@@ -268,15 +268,7 @@ def test_rocksdb_revindex_to_parquet_test6_tax_file_doesnt_exist(runtmp, capfd):
     out_parquet = runtmp.output("test6.parquet")
 
     with pytest.raises(SourmashCommandFailed):
-        runtmp.sourmash(
-            "scripts",
-            "revindex_to_parquet",
-            revindex,
-            "--output",
-            out_parquet,
-            "--taxonomy",
-            tax_csv,
-        )
+        _run_export(runtmp, revindex, taxonomy=tax_csv, output=out_parquet)
 
     captured = capfd.readouterr()
     print(captured.out)
@@ -294,78 +286,45 @@ def test_rocksdb_revindex_to_parquet_test6_empty_tax_file(runtmp, capfd):
     with open(tax_csv, "w") as f:
         pass
     # check that the file is empty
-    with open(tax_csv, "r") as f:
-        content = f.read()
-        assert content == ""
+    assert os.stat(tax_csv).st_size == 0
 
     with pytest.raises(SourmashCommandFailed):
-        runtmp.sourmash(
-            "scripts",
-            "revindex_to_parquet",
-            revindex,
-            "--output",
-            out_parquet,
-            "--taxonomy",
-            tax_csv,
-        )
+        _run_export(runtmp, revindex, taxonomy=tax_csv, output=out_parquet)
 
     captured = capfd.readouterr()
     print(captured.out)
     print(captured.err)
 
-    assert f"Error: Provided taxonomy file '{tax_csv}' is empty or failed to parse."
+    assert (
+        f"Error: Provided taxonomy file '{tax_csv}' is empty or failed to parse."
+        in captured.err
+    )
 
 
-def test_rocksdb_revindex_to_parquet_test6_multiple_revindex_diff_scaled(runtmp, capfd):
+@pytest.mark.slow
+def test_rocksdb_revindex_to_parquet_test6_multiple_revindex_diff_scaled(export_revindex):
     revindex1 = get_test_data("test6.rocksdb")
     revindex2 = get_test_data("podar-ref-subset.branch0_9_13.internal.rocksdb")
     tax_csv = get_test_data("test6.taxonomy.csv")
-    out_parquet = runtmp.output("test6.parquet")
-    lca_csv = runtmp.output("test6.lca.csv")
-
-    runtmp.sourmash(
-        "scripts",
-        "revindex_to_parquet",
-        revindex1,
-        revindex2,
-        "--output",
-        out_parquet,
-        "--taxonomy",
-        tax_csv,
-        "--lca-info",
-        lca_csv,
+    out_parquet, lca_csv = export_revindex(
+        revindex1, revindex2, taxonomy=tax_csv, lca_info=True
     )
 
-    captured = capfd.readouterr()
-    print(captured.out)
-    print(captured.err)
-
     assert os.path.exists(out_parquet), f"Expected output file at {out_parquet}."
 
-    # verify content with Polars
-    df = pl.read_parquet(out_parquet)
-    # print the first few rows
-    print(df.head())
-    assert "hash" in df.columns
-    assert "dataset_names" in df.columns
-    assert len(df.columns) == 8
-    assert len(df) == 23994
+    # check row count and columns from the parquet metadata
+    n_rows, columns = parquet_shape(out_parquet)
+    assert "hash" in columns
+    assert "dataset_names" in columns
+    assert len(columns) == 8
+    assert n_rows == 23994
+
     # check some hashes
     target_hash_1 = 8357480319128064
     expected_names_1 = {
         "GCF_000021665.1 Shewanella baltica OS223",
         "GCF_000017325.1 Shewanella baltica OS185",
     }
-    expected_tax_1 = (
-        "d__Bacteria;p__Proteobacteria;c__Gammaproteobacteria;"
-        "o__Enterobacterales;f__Shewanellaceae;g__Shewanella;"
-        "s__Shewanella baltica;" * 2
-    ).rstrip(";")
-    expected_lca_lineage_1 = (
-        "d__Bacteria;p__Proteobacteria;c__Gammaproteobacteria;"
-        "o__Enterobacterales;f__Shewanellaceae;g__Shewanella;"
-        "s__Shewanella baltica"
-    )
 
     target_hash_2 = 2925290528259
     expected_names_2 = {
@@ -373,46 +332,61 @@ def test_rocksdb_revindex_to_parquet_test6_multiple_revindex_diff_scaled(runtmp,
         "NC_011665.1 Shewanella baltica OS223 plasmid pS22303, complete sequence",
     }
 
-    found_1 = False
-    found_2 = False
-    found_3 = False
-
-    for row in df.iter_rows(named=True):
-        if row["hash"] == target_hash_1:
-            print(row)
-            found_1 = True
-            assert set(row["dataset_names"]) == expected_names_1
-            assert ";".join(row["taxonomy_list"]) == expected_tax_1
-            assert row["lca_lineage"] == expected_lca_lineage_1
-            assert row["lca_rank"] == "species"
-        elif row["hash"] == target_hash_2:
-            print(row)
-            # this hash is actually found in both revindexes
-            if row["source"] == "podar-ref-subset.branch0_9_13.internal.rocksdb":
-                found_2 = True
-                assert set(row["dataset_names"]) == expected_names_2
-                assert not row["taxonomy_list"], (
-                    "Expected taxonomy_list to be empty or None"
-                )
-                assert row["lca_lineage"] in (None, ""), "Expected no lca_lineage"
-                assert row["lca_rank"] in (None, ""), "Expected no lca_rank"
-                assert row["scaled"] == 100000
-            elif row["source"] == "test6.rocksdb":
-                found_3 = True
-                assert set(row["dataset_names"]) == expected_names_1
-                assert row["scaled"] == 1000
-                assert ";".join(row["taxonomy_list"]) == expected_tax_1
-
-    assert found_1, f"Did not find a row with hash {target_hash_1}"
-    assert found_2, (
-        f"Did not find a row with hash {target_hash_2} in podar-ref-subset.branch0_9_13.internal.rocksdb"
+    # verify content with Polars; the hash filter is pushed into the parquet scan
+    hits = (
+        pl.scan_parquet(out_parquet)
+        .filter(pl.col("hash").is_in([target_hash_1, target_hash_2]))
+        .select(
+            [
+                "hash",
+                "dataset_names",
+                "taxonomy_list",
+                "lca_lineage",
+                "lca_rank",
+                "scaled",
+                "source",
+            ]
+        )
+        .collect()
+    )
+    print(hits)
+
+    rows_1 = hits.filter(pl.col("hash") == target_hash_1)
+    assert rows_1.height == 1, f"Expected one row with hash {target_hash_1}"
+    row = rows_1.row(0, named=True)
+    assert set(row["dataset_names"]) == expected_names_1
+    assert row["taxonomy_list"] == _EXPECTED_TAX_LIST
+    assert row["lca_lineage"] == _SHEWANELLA_LINEAGE
+    assert row["lca_rank"] == "species"
+
+    # this hash is actually found in both revindexes
+    rows_2 = hits.filter(pl.col("hash") == target_hash_2)
+    podar_rows = rows_2.filter(
+        pl.col("source") == "podar-ref-subset.branch0_9_13.internal.rocksdb"
     )
-    assert found_3, f"Did not find a row with hash {target_hash_2} in test6.rocksdb"
+    assert podar_rows.height == 1, (
+        f"Expected one row with hash {target_hash_2} in podar-ref-subset.branch0_9_13.internal.rocksdb"
+    )
+    row = podar_rows.row(0, named=True)
+    assert set(row["dataset_names"]) == expected_names_2
+    assert not row["taxonomy_list"], "Expected taxonomy_list to be empty or None"
+    assert row["lca_lineage"] in (None, ""), "Expected no lca_lineage"
+    assert row["lca_rank"] in (None, ""), "Expected no lca_rank"
+    assert row["scaled"] == 100000
+
+    test6_rows = rows_2.filter(pl.col("source") == "test6.rocksdb")
+    assert test6_rows.height == 1, (
+        f"Expected one row with hash {target_hash_2} in test6.rocksdb"
+    )
+    row = test6_rows.row(0, named=True)
+    assert set(row["dataset_names"]) == expected_names_1
+    assert row["scaled"] == 1000
+    assert row["taxonomy_list"] == _EXPECTED_TAX_LIST
 
     # check that the lca file was created
     assert os.path.exists(lca_csv), f"Expected output file at {lca_csv}."
     # check that the lca file contains the expected columns
-    lca_df = pd.read_csv(lca_csv)
+    lca_df = pl.read_csv(lca_csv)
     print(lca_df)
     expected_rows = [
         {"source": "test6.rocksdb", "lca_rank": "family", "count": 8, "percent": 0.03},
@@ -430,102 +404,86 @@ def test_rocksdb_revindex_to_parquet_test6_multiple_revindex_diff_scaled(runtmp,
             "percent": 100.00,
         },
     ]
-    for expected_row in expected_rows:
-        assert any(
-            all(row[k] == expected_row[k] for k in expected_row)
-            for row in lca_df.to_dict(orient="records")
-        ), f"Expected row not found: {expected_row}. row found: {row}"
+    assert_rows_present(lca_df, expected_rows)
 
 
-def test_rocksdb_revindex_to_parquet_test6_multiple_revindex_same_scaled(runtmp, capfd):
+def test_rocksdb_revindex_to_parquet_test6_multiple_revindex_same_scaled(export_revindex):
     revindex1 = get_test_data("test6.k31-sc100_000.rocksdb")
     revindex2 = get_test_data("podar-ref-subset.branch0_9_13.internal.rocksdb")
     tax_csv = get_test_data("test6.taxonomy.csv")
-    out_parquet = runtmp.output("combined.parquet")
-    lca_csv = runtmp.output("combined.lca.csv")
-
-    runtmp.sourmash(
-        "scripts",
-        "revindex_to_parquet",
-        revindex1,
-        revindex2,
-        "--output",
-        out_parquet,
-        "--taxonomy",
-        tax_csv,
-        "--lca-info",
-        lca_csv,
+    out_parquet, lca_csv = export_revindex(
+        revindex1, revindex2, taxonomy=tax_csv, lca_info=True
     )
 
-    captured = capfd.readouterr()
-    print(captured.out)
-    print(captured.err)
-
     assert os.path.exists(out_parquet), f"Expected output file at {out_parquet}."
 
-    # verify content with Polars
-    df = pl.read_parquet(out_parquet)
-    # print the first few rows
-    print(df.head())
-    assert "hash" in df.columns
-    assert "dataset_names" in df.columns
-    assert len(df.columns) == 8
-    assert len(df) == 312
+    # check row count and columns from the parquet metadata
+    n_rows, columns = parquet_shape(out_parquet)
+    assert "hash" in columns
+    assert "dataset_names" in columns
+    assert len(columns) == 8
+    assert n_rows == 312
+
     # check a hash found in both revindexes
     target_hash = 2925290528259
     expected_names_1 = {
         "GCF_000021665.1 Shewanella baltica OS223",
         "GCF_000017325.1 Shewanella baltica OS185",
     }
-    expected_tax_1 = (
-        "d__Bacteria;p__Proteobacteria;c__Gammaproteobacteria;"
-        "o__Enterobacterales;f__Shewanellaceae;g__Shewanella;"
-        "s__Shewanella baltica;" * 2
-    ).rstrip(";")
-    expected_lca_lineage_1 = (
-        "d__Bacteria;p__Proteobacteria;c__Gammaproteobacteria;"
-        "o__Enterobacterales;f__Shewanellaceae;g__Shewanella;"
-        "s__Shewanella baltica"
-    )
 
     expected_names_2 = {
         "NC_009661.1 Shewanella baltica OS185 plasmid pS18501, complete sequence",
         "NC_011665.1 Shewanella baltica OS223 plasmid pS22303, complete sequence",
     }
 
-    found_1 = False
-    found_2 = False
-
-    for row in df.iter_rows(named=True):
-        if row["hash"] == target_hash:
-            print(row)
-            if row["source"] == "test6.k31-sc100_000.rocksdb":
-                found_1 = True
-                assert set(row["dataset_names"]) == expected_names_1
-                assert row["scaled"] == 100000
-                assert ";".join(row["taxonomy_list"]) == expected_tax_1
-                assert row["lca_lineage"] == expected_lca_lineage_1
-                assert row["lca_rank"] == "species"
-            # this hash is actually found in both revindexes
-            elif row["source"] == "podar-ref-subset.branch0_9_13.internal.rocksdb":
-                found_2 = True
-                assert set(row["dataset_names"]) == expected_names_2
-                assert not row["taxonomy_list"], (
-                    "Expected taxonomy_list to be empty or None"
-                )
-                assert row["lca_lineage"] in (None, ""), "Expected no lca_lineage"
-                assert row["lca_rank"] in (None, ""), "Expected no lca_rank"
-                assert row["scaled"] == 100000
-
-    assert found_1, f"Did not find a row with hash {target_hash} in test6.k31-sc100_000.rocksdb"
-    assert found_2, (
-        f"Did not find a row with hash {target_hash} in podar-ref-subset.branch0_9_13.internal.rocksdb"
+    # verify content with Polars; the hash filter is pushed into the parquet scan
+    hits = (
+        pl.scan_parquet(out_parquet)
+        .filter(pl.col("hash").is_in([target_hash]))
+        .select(
+            [
+                "hash",
+                "dataset_names",
+                "taxonomy_list",
+                "lca_lineage",
+                "lca_rank",
+                "scaled",
+                "source",
+            ]
+        )
+        .collect()
+    )
+    print(hits)
+
+    test6_rows = hits.filter(pl.col("source") == "test6.k31-sc100_000.rocksdb")
+    assert test6_rows.height == 1, (
+        f"Expected one row with hash {target_hash} in test6.k31-sc100_000.rocksdb"
+    )
+    row = test6_rows.row(0, named=True)
+    assert set(row["dataset_names"]) == expected_names_1
+    assert row["scaled"] == 100000
+    assert row["taxonomy_list"] == _EXPECTED_TAX_LIST
+    assert row["lca_lineage"] == _SHEWANELLA_LINEAGE
+    assert row["lca_rank"] == "species"
+
+    # this hash is actually found in both revindexes
+    podar_rows = hits.filter(
+        pl.col("source") == "podar-ref-subset.branch0_9_13.internal.rocksdb"
+    )
+    assert podar_rows.height == 1, (
+        f"Expected one row with hash {target_hash} in podar-ref-subset.branch0_9_13.internal.rocksdb"
     )
+    row = podar_rows.row(0, named=True)
+    assert set(row["dataset_names"]) == expected_names_2
+    assert not row["taxonomy_list"], "Expected taxonomy_list to be empty or None"
+    assert row["lca_lineage"] in (None, ""), "Expected no lca_lineage"
+    assert row["lca_rank"] in (None, ""), "Expected no lca_rank"
+    assert row["scaled"] == 100000
 
     # check that the lca file was created
     assert os.path.exists(lca_csv), f"Expected output file at {lca_csv}."
     # check that the lca file contains the expected columns
-    lca_df = pd.read_csv(lca_csv)
+    lca_df = pl.read_csv(lca_csv)
     print(lca_df)
     expected_rows = [
         {
@@ -561,8 +519,4 @@ def test_rocksdb_revindex_to_parquet_test6_multiple_revindex_same_scaled(runtmp,
             "percent": 26.92,
         },
     ]
-    for expected_row in expected_rows:
-        assert any(
-            all(row[k] == expected_row[k] for k in expected_row)
-            for row in lca_df.to_dict(orient="records")
-        ), f"Expected row not found: {expected_row}. row found: {row}"
+    assert_rows_present(lca_df, expected_rows)